@@ -4,17 +4,952 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
 import json
 import os
-import shutil
 import csv
+import sys
+import time
+import copy
+import random
+import argparse
+import hashlib
+import tempfile
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
 from PIL import Image, ImageTk
 import webbrowser
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 # 数据目录和主文件路径
 DATA_DIR = "bug_data"
 ATTACHMENTS_DIR = os.path.join(DATA_DIR, "attachments")
 MASTER_FILE = os.path.join(DATA_DIR, "master_list.json")
 
+# 附件上传参数
+CHUNK_SIZE = 1024 * 1024  # 分块复制大小（1MB）
+PART_SUFFIX = ".part"  # 上传中临时文件后缀
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif")
+THUMBNAIL_SIZE = (100, 100)
+
+# 缩略图在后台线程生成，避免大图阻塞界面
+THUMBNAIL_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+
+# 多用户共享数据目录时的参数
+LOCK_SUFFIX = ".lock"
+POLL_INTERVAL_MS = 2000  # 检测其他用户修改的轮询间隔
+REPLACE_RETRIES = 20  # Windows下目标文件被占用时重试替换的次数
+
+# 附件维护参数
+ORPHAN_GRACE_SECONDS = 3600  # 最近修改的文件可能正在上传或保存，不视为孤立文件
+VERIFY_CHUNKSIZE = 256  # 每个进程一次校验的图片数量
+
+
+def get_bug_attachments(bug_data):
+    """获取Bug的附件列表（兼容旧版单个attachment字段）"""
+    attachments = bug_data.get("attachments")
+    if attachments is not None:
+        return attachments
+    legacy_path = bug_data.get("attachment")
+    if legacy_path:
+        return [{"path": legacy_path, "name": os.path.basename(legacy_path)}]
+    return []
+
+
+def is_image_file(path):
+    """根据扩展名判断是否为图片"""
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def file_sha256(path, cancel_event=None):
+    """分块计算文件的SHA-256，可通过cancel_event中断"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reserve_attachment_path(file_name):
+    """在按日期分类的附件目录中预留一个不重名的路径，返回相对DATA_DIR的路径"""
+    today = datetime.now().strftime("%Y%m%d")
+    daily_dir = os.path.join(ATTACHMENTS_DIR, today)
+    os.makedirs(daily_dir, exist_ok=True)
+
+    base, ext = os.path.splitext(file_name)
+    candidate = file_name
+    index = 1
+    while True:
+        dest_path = os.path.join(daily_dir, candidate)
+        if not os.path.exists(dest_path):
+            try:
+                # 以独占方式创建临时文件占位，防止并发上传同名文件互相覆盖
+                fd = os.open(dest_path + PART_SUFFIX, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return os.path.join("attachments", today, candidate)
+            except FileExistsError:
+                pass
+        candidate = f"{base}_{index}{ext}"
+        index += 1
+
+
+def remove_attachment_file(rel_path):
+    """删除附件文件（文件不存在时忽略）"""
+    full_path = os.path.join(DATA_DIR, rel_path)
+    if os.path.exists(full_path):
+        os.remove(full_path)
+
+
+def load_thumbnail(full_path):
+    """读取图片并生成缩略图（在后台线程执行）"""
+    with Image.open(full_path) as img:
+        img.thumbnail(THUMBNAIL_SIZE)
+        return img.copy()
+
+
+# 导出字段
+EXPORT_FIELDNAMES = ['ID', '测试问题', '问题详细', '复现步骤', '解决负责人', '状态', '最后修改时间', '附件路径']
+CHANGE_TYPES = {"created": "新增", "changed": "修改", "deleted": "删除"}
+DEFAULT_EXPORT_TARGET = "default"  # 未指定导出目标名称时使用
+
+
+def new_project_data():
+    """空项目数据"""
+    return {"bugs": {}, "next_id": 1, "rev": 0, "deleted": {}, "export_checkpoints": {}}
+
+
+def load_project_data(filename):
+    """读取项目文件，补全旧版文件缺少的字段（文件不存在时返回空项目）"""
+    data = new_project_data()
+    if os.path.exists(filename):
+        with open(filename, 'r') as f:
+            data = json.load(f)
+
+    data.setdefault("bugs", {})
+    data.setdefault("next_id", 1)
+    data.setdefault("rev", 0)  # 项目修改版本号，每次Bug变更递增
+    data.setdefault("deleted", {})  # 已删除Bug的墓碑记录，供增量导出使用
+    data.setdefault("export_checkpoints", {})  # 每个导出目标最后导出的版本号
+
+    for bug_data in data["bugs"].values():
+        # 将旧版单附件字段转换为附件列表
+        bug_data["attachments"] = get_bug_attachments(bug_data)
+        bug_data.pop("attachment", None)
+        bug_data.setdefault("rev", 0)
+        bug_data.setdefault("created_rev", 0)
+    return data
+
+
+def collect_changes(bugs, deleted, since):
+    """找出版本号大于since的变更（按版本号排序），返回 [(变更类型, Bug ID, 数据)]"""
+    changes = []
+    for bug_id, bug_data in bugs.items():
+        if bug_data["rev"] > since:
+            change_type = "created" if bug_data["created_rev"] > since else "changed"
+            changes.append((change_type, bug_id, bug_data))
+    changes.extend(("deleted", bug_id, tombstone) for bug_id, tombstone in deleted.items()
+                   if tombstone["rev"] > since)
+    changes.sort(key=lambda change: change[2]["rev"])
+    return changes
+
+
+def bug_to_row(bug_id, bug_data):
+    """将Bug数据转换为CSV行"""
+    return {
+        'ID': bug_id,
+        '测试问题': bug_data['title'],
+        '问题详细': bug_data['description'],
+        '复现步骤': bug_data['steps'],
+        '解决负责人': bug_data['responsible'],
+        '状态': bug_data['status'],
+        '最后修改时间': bug_data['modified'],
+        '附件路径': "; ".join(attachment["path"] for attachment in get_bug_attachments(bug_data))
+    }
+
+
+def write_changes_csv(file_path, changes):
+    """将增量变更写入CSV文件，已删除的Bug只输出ID和删除时间"""
+    with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['变更类型', '版本号'] + EXPORT_FIELDNAMES)
+        writer.writeheader()
+        for change_type, bug_id, bug_data in changes:
+            if change_type == "deleted":
+                row = {'ID': bug_id, '最后修改时间': bug_data['modified']}
+            else:
+                row = bug_to_row(bug_id, bug_data)
+            row['变更类型'] = CHANGE_TYPES[change_type]
+            row['版本号'] = bug_data['rev']
+            writer.writerow(row)
+
+
+def export_incremental(data, target, file_path):
+    """导出目标target自上次检查点以来的变更到file_path并更新检查点，返回导出的变更数量"""
+    checkpoints = data["export_checkpoints"]
+    changes = collect_changes(data["bugs"], data["deleted"], checkpoints.get(target, -1))
+    write_changes_csv(file_path, changes)
+    checkpoints[target] = data["rev"]
+    prune_tombstones(data)
+    return len(changes)
+
+
+def prune_tombstones(data):
+    """删除所有导出目标都已导出的墓碑记录"""
+    if not data["export_checkpoints"]:
+        return
+    oldest_checkpoint = min(data["export_checkpoints"].values())
+    for bug_id, tombstone in list(data["deleted"].items()):
+        if tombstone["rev"] <= oldest_checkpoint:
+            del data["deleted"][bug_id]
+
+
+@contextlib.contextmanager
+def file_lock(filename):
+    """对数据文件加独占锁（使用旁路的.lock文件，跨进程、跨机器共享目录有效）"""
+    lock_file = open(filename + LOCK_SUFFIX, 'a+')
+    try:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK 重试约10秒后仍失败，继续等待
+                    continue
+        yield
+    finally:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        lock_file.close()
+
+
+def remove_lock_file(filename):
+    """删除数据文件对应的.lock文件（Windows下仍被其他进程占用时保留）"""
+    try:
+        os.remove(filename + LOCK_SUFFIX)
+    except OSError:
+        pass
+
+
+def write_json_atomic(filename, data):
+    """先写临时文件再原子替换，其他用户不会读到写了一半的文件"""
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(filename) + ".",
+                                     suffix=".tmp", dir=os.path.dirname(filename) or ".")
+    try:
+        # mkstemp创建的文件仅本人可读，沿用原文件权限以便其他用户访问
+        mode = os.stat(filename).st_mode & 0o777 if os.path.exists(filename) else 0o664
+        os.chmod(temp_path, mode)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(REPLACE_RETRIES):
+            try:
+                os.replace(temp_path, filename)
+                return
+            except PermissionError:
+                # Windows下目标文件正被其他进程读取
+                if attempt == REPLACE_RETRIES - 1:
+                    raise
+                time.sleep(0.05)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def get_file_stamp(filename):
+    """获取文件的修改标记（修改时间和大小），文件不存在时返回None"""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def merge_attachments(base, ours, theirs):
+    """三方合并附件列表：保留对方的附件，去掉本地移除的，加上本地新增的"""
+    base_paths = {attachment["path"] for attachment in base or []}
+    our_paths = {attachment["path"] for attachment in ours or []}
+    their_paths = {attachment["path"] for attachment in theirs or []}
+    merged = [attachment for attachment in theirs or []
+              if attachment["path"] not in base_paths or attachment["path"] in our_paths]
+    merged.extend(attachment for attachment in ours or []
+                  if attachment["path"] not in base_paths and attachment["path"] not in their_paths)
+    return merged
+
+
+def bug_id_sort_key(bug_id):
+    """Bug ID的排序键（按数值大小排序）"""
+    return len(bug_id), bug_id
+
+
+def ordered_keys(*dicts):
+    """按出现顺序合并多个字典的键，保证合并结果的顺序稳定"""
+    return list(dict.fromkeys(key for d in dicts for key in d))
+
+
+def merge_bug_fields(bug_id, base, ours, theirs, conflicts):
+    """按字段三方合并同一个Bug，双方修改了同一字段时以本地为准并记录冲突"""
+    merged = {}
+    for key in ordered_keys(theirs, ours, base):
+        if key in ("rev", "created_rev"):
+            continue
+        base_value, our_value, their_value = base.get(key), ours.get(key), theirs.get(key)
+        if key == "attachments":
+            merged[key] = merge_attachments(base_value, our_value, their_value)
+        elif our_value == base_value:
+            merged[key] = their_value
+        elif their_value == base_value or their_value == our_value:
+            merged[key] = our_value
+        elif key == "modified":
+            merged[key] = max(our_value or "", their_value or "")
+        else:
+            merged[key] = our_value
+            conflicts.append((bug_id, key))
+    merged["rev"] = theirs["rev"]
+    merged["created_rev"] = theirs["created_rev"]
+    return merged
+
+
+def merge_bugs(base, ours, theirs):
+    """三方合并Bug字典，返回 (合并结果, 冲突列表, 需要分配新版本号的Bug ID)"""
+    merged = {}
+    conflicts = []
+    changed = []
+    for bug_id in sorted(ordered_keys(theirs, ours, base), key=bug_id_sort_key):
+        base_bug, our_bug, their_bug = base.get(bug_id), ours.get(bug_id), theirs.get(bug_id)
+        if our_bug == base_bug or our_bug == their_bug:
+            result = their_bug
+        elif their_bug == base_bug:
+            result = our_bug
+            changed.append(bug_id)
+        elif our_bug is None:
+            # 本地删除而对方修改了，保留对方的修改
+            result = their_bug
+            conflicts.append((bug_id, None))
+        elif their_bug is None:
+            # 对方删除而本地修改了，保留本地的修改
+            result = our_bug
+            changed.append(bug_id)
+            conflicts.append((bug_id, None))
+        else:
+            result = merge_bug_fields(bug_id, base_bug or {}, our_bug, their_bug, conflicts)
+            changed.append(bug_id)
+
+        if result is not None:
+            merged[bug_id] = result
+    return merged, conflicts, changed
+
+
+def merge_project(base, ours, theirs):
+    """将本地修改（相对base）合并到磁盘上的最新版本theirs，返回 (合并结果, 冲突列表)"""
+    bugs, conflicts, changed = merge_bugs(base["bugs"], ours["bugs"], theirs["bugs"])
+    deleted = {bug_id: tombstone for bug_id, tombstone in theirs["deleted"].items()
+               if bug_id not in bugs}
+
+    # 在磁盘版本号的基础上为本地变更重新分配版本号，保证版本号在所有用户之间唯一递增
+    rev = theirs["rev"]
+    for bug_id in sorted(changed, key=bug_id_sort_key):
+        rev += 1
+        if bug_id in bugs:
+            bugs[bug_id]["rev"] = rev
+            if bug_id not in base["bugs"] and bug_id not in theirs["bugs"]:
+                bugs[bug_id]["created_rev"] = rev
+            deleted.pop(bug_id, None)
+        else:
+            tombstone = ours["deleted"].get(bug_id, {})
+            deleted[bug_id] = {"rev": rev, "modified": tombstone.get("modified", "")}
+
+    checkpoints = dict(theirs["export_checkpoints"])
+    for target_key, checkpoint in ours["export_checkpoints"].items():
+        checkpoints[target_key] = max(checkpoint, checkpoints.get(target_key, -1))
+
+    merged = {
+        "bugs": bugs,
+        "next_id": max(ours["next_id"], theirs["next_id"]),
+        "rev": rev,
+        "deleted": deleted,
+        "export_checkpoints": checkpoints
+    }
+    prune_tombstones(merged)
+    return merged, conflicts
+
+
+def commit_project(filename, base, ours, must_exist=False):
+    """加锁读取磁盘上的最新版本，合并本地修改后原子写回，返回 (合并结果, 冲突列表, 文件修改标记)"""
+    with file_lock(filename):
+        # 已读写过的项目文件消失说明被其他用户重命名或删除，不能写入空项目
+        if must_exist and not os.path.exists(filename):
+            raise FileNotFoundError(filename)
+        theirs = load_project_data(filename)
+        merged, conflicts = merge_project(base, ours, theirs)
+        if merged != theirs:
+            write_json_atomic(filename, merged)
+        return merged, conflicts, get_file_stamp(filename)
+
+
+def read_project(filename):
+    """加锁读取项目文件，返回 (项目数据, 文件修改标记)"""
+    with file_lock(filename):
+        return load_project_data(filename), get_file_stamp(filename)
+
+
+def allocate_bug_id(filename, must_exist=False):
+    """加锁分配新的Bug ID，多个用户同时新建Bug时不会重复"""
+    with file_lock(filename):
+        if must_exist and not os.path.exists(filename):
+            raise FileNotFoundError(filename)
+        data = load_project_data(filename)
+        bug_id = data["next_id"]
+        data["next_id"] = bug_id + 1
+        write_json_atomic(filename, data)
+    return bug_id
+
+
+def merge_list_names(base, ours, theirs):
+    """三方合并项目名称列表（新建、删除、重命名）"""
+    merged = [name for name in theirs if name not in base or name in ours]
+    merged.extend(name for name in ours if name not in base and name not in theirs)
+    return merged
+
+
+def iter_project_files():
+    """遍历数据目录中的所有项目文件"""
+    for entry in os.scandir(DATA_DIR):
+        if entry.is_file() and entry.name.endswith(".json") and entry.path != MASTER_FILE:
+            yield entry.path
+
+
+def normalize_attachment_path(rel_path):
+    """统一附件相对路径的分隔符为"/"（Windows客户端保存的路径使用反斜杠），用于比较"""
+    return os.path.normpath(rel_path.replace("\\", "/")).replace("\\", "/")
+
+
+def collect_attachment_refs():
+    """从所有项目文件中收集附件引用，返回 {规范化的相对路径: [(项目, Bug ID, 附件信息)]}"""
+    refs = {}
+    for filename in iter_project_files():
+        project = os.path.splitext(os.path.basename(filename))[0]
+        with open(filename, 'r') as f:
+            bugs = json.load(f).get("bugs", {})
+        for bug_id, bug_data in bugs.items():
+            for attachment in get_bug_attachments(bug_data):
+                rel_path = normalize_attachment_path(attachment["path"])
+                refs.setdefault(rel_path, []).append((project, bug_id, attachment))
+    return refs
+
+
+def scan_directory(path):
+    """递归扫描目录，返回 [(相对路径, 大小, 修改时间)]"""
+    files = []
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    rel_path = os.path.relpath(entry.path, DATA_DIR)
+                    files.append((rel_path, stat.st_size, stat.st_mtime))
+    return files
+
+
+def walk_attachments(workers=None):
+    """并行扫描附件目录，每个日期子目录由一个线程处理"""
+    files = []
+    subdirs = []
+    with os.scandir(ATTACHMENTS_DIR) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                files.append((os.path.relpath(entry.path, DATA_DIR), stat.st_size, stat.st_mtime))
+
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as executor:
+        for result in executor.map(scan_directory, subdirs):
+            files.extend(result)
+    return files
+
+
+def verify_image(full_path):
+    """使用Pillow校验图片完整性，返回错误信息，正常时返回None（在工作进程中执行）"""
+    try:
+        with Image.open(full_path) as img:
+            img.verify()
+        return None
+    except Exception as e:
+        return str(e) or e.__class__.__name__
+
+
+def scan_attachments(dry_run=True, workers=None):
+    """检查附件完整性：报告缺失、孤立和损坏的附件，非dry_run时删除孤立文件"""
+    refs = collect_attachment_refs()
+    files = walk_attachments(workers)
+    now = time.time()
+
+    existing = {}
+    orphaned = []
+    for rel_path, size, mtime in files:
+        rel_path = normalize_attachment_path(rel_path)
+        existing[rel_path] = size
+        if rel_path not in refs and now - mtime > ORPHAN_GRACE_SECONDS:
+            orphaned.append((rel_path, size))
+
+    missing = []
+    corrupt = []
+    images = []
+    for rel_path, owners in refs.items():
+        if rel_path not in existing:
+            missing.extend((project, bug_id, rel_path) for project, bug_id, _ in owners)
+            continue
+        expected_size = owners[0][2].get("size")
+        if expected_size is not None and expected_size != existing[rel_path]:
+            corrupt.append((rel_path, f"文件大小不符: {existing[rel_path]} != {expected_size}"))
+        elif is_image_file(rel_path):
+            images.append(rel_path)
+
+    # 图片解码是CPU密集型任务，使用多进程校验
+    if images:
+        full_paths = [os.path.join(DATA_DIR, rel_path) for rel_path in images]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for rel_path, error in zip(images, executor.map(verify_image, full_paths,
+                                                            chunksize=VERIFY_CHUNKSIZE)):
+                if error:
+                    corrupt.append((rel_path, error))
+
+    reclaimed = 0
+    if not dry_run:
+        reclaimed = remove_orphans(orphaned)
+
+    return {
+        "files": len(files),
+        "missing": missing,
+        "orphaned": orphaned,
+        "orphaned_bytes": sum(size for _, size in orphaned),
+        "corrupt": corrupt,
+        "reclaimed_bytes": reclaimed
+    }
+
+
+def remove_orphans(orphaned):
+    """删除已确认的孤立附件，返回释放的字节数"""
+    # 删除前重新读取所有项目文件，跳过已被引用（包括被判为缺失的引用）和最近修改过的文件
+    refs = collect_attachment_refs()
+    now = time.time()
+    reclaimed = 0
+    for rel_path, size in orphaned:
+        if normalize_attachment_path(rel_path) in refs:
+            continue
+        full_path = os.path.join(DATA_DIR, rel_path)
+        try:
+            if now - os.path.getmtime(full_path) <= ORPHAN_GRACE_SECONDS:
+                continue
+            os.remove(full_path)
+            reclaimed += size
+        except OSError:
+            pass
+    remove_empty_dirs(ATTACHMENTS_DIR)
+    return reclaimed
+
+
+def remove_empty_dirs(root_dir):
+    """删除附件目录下的空子目录"""
+    for dirpath, dirnames, filenames in os.walk(root_dir, topdown=False):
+        if dirpath != root_dir and not dirnames and not filenames:
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+
+def stress_worker(args):
+    """压力测试工作进程：反复新建Bug、修改自己的Bug，并修改共享Bug上属于自己的字段"""
+    filename, worker, ops = args
+    rng = random.Random(worker)
+    created = []
+    resolved = set()
+    for i in range(ops):
+        base, _ = read_project(filename)
+        ours = copy.deepcopy(base)
+
+        bug_id = allocate_bug_id(filename)
+        ours["bugs"][str(bug_id)] = {
+            "title": f"worker {worker} bug {i}",
+            "description": "",
+            "steps": "",
+            "responsible": f"worker {worker}",
+            "status": "待处理",
+            "modified": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "attachments": []
+        }
+        ours["bugs"]["0"][f"worker_{worker}"] = i
+        if created and rng.random() < 0.5:
+            target = rng.choice(created)
+            if str(target) in ours["bugs"]:
+                ours["bugs"][str(target)]["status"] = "已解决"
+                resolved.add(target)
+
+        commit_project(filename, base, ours)
+        created.append(bug_id)
+        time.sleep(rng.random() * 0.005)
+    return worker, created, sorted(resolved)
+
+
+def run_stress_test(processes, ops, directory=None):
+    """多进程并发写同一个项目文件，检查是否有修改丢失，返回错误列表"""
+    with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+        filename = os.path.join(temp_dir, "stress.json")
+        data = new_project_data()
+        data["bugs"]["0"] = {"title": "shared", "description": "", "steps": "", "responsible": "",
+                             "status": "待处理", "modified": "", "attachments": [],
+                             "rev": 0, "created_rev": 0}
+        write_json_atomic(filename, data)
+
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(stress_worker, [(filename, worker, ops) for worker in range(processes)])
+        data, _ = read_project(filename)
+
+    errors = []
+    bugs = data["bugs"]
+    all_ids = [bug_id for _, created, _ in results for bug_id in created]
+    if len(set(all_ids)) != len(all_ids):
+        errors.append(f"Bug ID重复: 分配了 {len(all_ids)} 个，其中不重复的 {len(set(all_ids))} 个")
+    if len(bugs) != len(all_ids) + 1:
+        errors.append(f"Bug数量不符: 期望 {len(all_ids) + 1}，实际 {len(bugs)}")
+    if data["next_id"] <= max(all_ids, default=0):
+        errors.append(f"next_id 错误: {data['next_id']}")
+
+    for worker, created, resolved in results:
+        for i, bug_id in enumerate(created):
+            bug_data = bugs.get(str(bug_id))
+            if bug_data is None or bug_data["title"] != f"worker {worker} bug {i}":
+                errors.append(f"丢失Bug: worker {worker} bug {i} (ID {bug_id})")
+        for bug_id in resolved:
+            if bugs.get(str(bug_id), {}).get("status") != "已解决":
+                errors.append(f"丢失状态修改: Bug {bug_id}")
+        if bugs["0"].get(f"worker_{worker}") != ops - 1:
+            errors.append(f"丢失共享Bug的字段修改: worker_{worker} = {bugs['0'].get(f'worker_{worker}')}")
+
+    revs = [bug_data["rev"] for bug_data in bugs.values() if bug_data["rev"]]
+    if len(set(revs)) != len(revs):
+        errors.append("版本号重复")
+    return errors
+
+
+def format_scan_report(report, dry_run):
+    """格式化附件检查结果"""
+    lines = [
+        f"扫描文件: {report['files']}",
+        f"缺失附件: {len(report['missing'])}",
+        f"损坏附件: {len(report['corrupt'])}",
+        f"孤立附件: {len(report['orphaned'])} ({report['orphaned_bytes'] / 1024 / 1024:.1f} MB)",
+    ]
+    if not dry_run:
+        lines.append(f"已释放空间: {report['reclaimed_bytes'] / 1024 / 1024:.1f} MB")
+    return "\n".join(lines)
+
+
+class AttachmentUpload(threading.Thread):
+    """后台线程中分块复制附件，并在完成后校验SHA-256"""
+
+    def __init__(self, src_path, rel_path):
+        super().__init__(daemon=True)
+        self.src_path = src_path
+        self.rel_path = rel_path
+        self.file_name = os.path.basename(src_path)
+        self.total = os.path.getsize(src_path)
+        self.copied = 0
+        self.verifying = False
+        self.done = False
+        self.cancelled = False
+        self.error = None
+        self.result = None
+        self.cancel_event = threading.Event()
+        self.finish_lock = threading.Lock()
+
+    def cancel(self):
+        """请求取消上传，若上传已完成则返回False"""
+        with self.finish_lock:
+            self.cancel_event.set()
+            return self.result is None
+
+    def run(self):
+        dest_path = os.path.join(DATA_DIR, self.rel_path)
+        part_path = dest_path + PART_SUFFIX
+        try:
+            digest = hashlib.sha256()
+            with open(self.src_path, 'rb') as fsrc, open(part_path, 'wb') as fdst:
+                while not self.cancel_event.is_set():
+                    chunk = fsrc.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    fdst.write(chunk)
+                    self.copied += len(chunk)
+                fdst.flush()
+                os.fsync(fdst.fileno())
+
+            # 重新读取目标文件校验，确认写入内容与源文件一致
+            self.verifying = True
+            checksum = None
+            if not self.cancel_event.is_set():
+                checksum = file_sha256(part_path, self.cancel_event)
+                if checksum is not None and checksum != digest.hexdigest():
+                    raise IOError("校验和不一致，文件可能已损坏")
+
+            with self.finish_lock:
+                if self.cancel_event.is_set():
+                    self.cancelled = True
+                else:
+                    os.replace(part_path, dest_path)
+                    self.result = {
+                        "path": self.rel_path,
+                        "name": self.file_name,
+                        "size": self.copied,
+                        "sha256": checksum
+                    }
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            self.done = True
+
+
+class AttachmentPanel:
+    """Bug对话框中的附件区域：附件列表、并发上传进度和缩略图预览"""
+
+    def __init__(self, dialog, parent, attachments):
+        self.dialog = dialog
+        self.attachments = list(attachments)
+        self.added_paths = []  # 本次对话框中新上传的附件
+        self.removed_paths = []  # 本次对话框中移除的附件
+        self.uploads = {}  # upload -> (行框架, 进度条, 进度标签)
+        self.thumbnails = {}
+        self.pending_preview = None
+        self.polling = False
+        self.closed = False
+
+        self.frame = ttk.LabelFrame(parent, text="附件")
+
+        content_frame = ttk.Frame(self.frame)
+        content_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        self.listbox = tk.Listbox(content_frame, height=5, width=50)
+        list_scroll = ttk.Scrollbar(content_frame, command=self.listbox.yview)
+        self.listbox.config(yscrollcommand=list_scroll.set)
+        self.listbox.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        list_scroll.pack(side=tk.LEFT, fill=tk.Y)
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+        self.listbox.bind("<Double-1>", lambda event: self.view_attachment())
+
+        self.preview_label = ttk.Label(content_frame, text="无预览", width=14, anchor=tk.CENTER)
+        self.preview_label.pack(side=tk.LEFT, padx=10)
+
+        btn_frame = ttk.Frame(self.frame)
+        btn_frame.pack(pady=5)
+        ttk.Button(btn_frame, text="上传附件",
+                   command=self.upload_attachments).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="查看附件",
+                   command=self.view_attachment).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="移除附件",
+                   command=self.remove_attachment).pack(side=tk.LEFT, padx=5)
+
+        self.progress_frame = ttk.Frame(self.frame)
+        self.progress_frame.pack(fill=tk.X, padx=5)
+
+        self.refresh_listbox()
+
+    def refresh_listbox(self):
+        """刷新附件列表显示"""
+        self.listbox.delete(0, tk.END)
+        for attachment in self.attachments:
+            self.listbox.insert(tk.END, attachment["name"])
+        if not self.attachments:
+            self.preview_label.configure(image="", text="无附件")
+
+    def get_selected_attachment(self):
+        """获取当前选中的附件"""
+        selection = self.listbox.curselection()
+        if not selection:
+            return None
+        return self.attachments[selection[0]]
+
+    def is_busy(self):
+        """是否仍有附件正在上传"""
+        return bool(self.uploads)
+
+    def upload_attachments(self):
+        """选择一个或多个文件并在后台上传"""
+        file_paths = filedialog.askopenfilenames(
+            parent=self.dialog,
+            title="选择附件文件",
+            filetypes=[("所有文件", "*.*"), ("Image files", "*.jpg *.jpeg *.png *.bmp *.gif")]
+        )
+
+        for file_path in file_paths:
+            rel_path = None
+            try:
+                rel_path = reserve_attachment_path(os.path.basename(file_path))
+                upload = AttachmentUpload(file_path, rel_path)
+            except OSError as e:
+                # 删除预留的占位文件
+                if rel_path:
+                    remove_attachment_file(rel_path + PART_SUFFIX)
+                messagebox.showerror("错误", f"无法上传文件: {str(e)}", parent=self.dialog)
+                continue
+
+            row = ttk.Frame(self.progress_frame)
+            row.pack(fill=tk.X, pady=2)
+            ttk.Label(row, text=upload.file_name, width=25).pack(side=tk.LEFT)
+            progress = ttk.Progressbar(row, maximum=100, length=250)
+            progress.pack(side=tk.LEFT, padx=5)
+            progress_label = ttk.Label(row, text="0%", width=8)
+            progress_label.pack(side=tk.LEFT)
+            ttk.Button(row, text="取消",
+                       command=lambda u=upload: u.cancel()).pack(side=tk.LEFT, padx=5)
+
+            self.uploads[upload] = (row, progress, progress_label)
+            upload.start()
+
+        self.start_polling()
+
+    def start_polling(self):
+        """启动上传进度和缩略图的轮询"""
+        if not self.polling and not self.closed:
+            self.polling = True
+            self.dialog.after(100, self.poll)
+
+    def poll(self):
+        """在主线程中更新上传进度、处理完成的上传和缩略图"""
+        self.polling = False
+        if self.closed:
+            return
+
+        for upload, (row, progress, progress_label) in list(self.uploads.items()):
+            if not upload.done:
+                percent = upload.copied * 100 // upload.total if upload.total else 100
+                progress["value"] = percent
+                progress_label.config(text="校验中" if upload.verifying else f"{percent}%")
+                continue
+
+            row.destroy()
+            del self.uploads[upload]
+            if upload.error:
+                messagebox.showerror("错误", f"上传 {upload.file_name} 失败: {upload.error}", parent=self.dialog)
+            elif upload.result:
+                self.attachments.append(upload.result)
+                self.added_paths.append(upload.result["path"])
+                self.refresh_listbox()
+                self.listbox.selection_clear(0, tk.END)
+                self.listbox.selection_set(tk.END)
+                self.show_preview(upload.result)
+
+        if self.pending_preview and self.pending_preview[1].done():
+            attachment, future = self.pending_preview
+            self.pending_preview = None
+            try:
+                photo = ImageTk.PhotoImage(future.result())
+                self.thumbnails[attachment["path"]] = photo
+            except Exception:
+                photo = None
+            if self.get_selected_attachment() is attachment:
+                self.set_preview(photo)
+
+        if self.uploads or self.pending_preview:
+            self.start_polling()
+
+    def on_select(self, event=None):
+        """附件选择变更时显示预览"""
+        attachment = self.get_selected_attachment()
+        if attachment:
+            self.show_preview(attachment)
+
+    def show_preview(self, attachment):
+        """显示附件缩略图，未缓存时在后台生成"""
+        if not is_image_file(attachment["path"]):
+            self.preview_label.configure(image="", text="无预览")
+            return
+
+        photo = self.thumbnails.get(attachment["path"])
+        if photo:
+            self.set_preview(photo)
+            return
+
+        full_path = os.path.join(DATA_DIR, attachment["path"])
+        self.preview_label.configure(image="", text="加载中...")
+        self.pending_preview = (attachment, THUMBNAIL_EXECUTOR.submit(load_thumbnail, full_path))
+        self.start_polling()
+
+    def set_preview(self, photo):
+        """设置预览图片"""
+        if photo:
+            self.preview_label.configure(image=photo, text="")
+            self.preview_label.image = photo
+        else:
+            self.preview_label.configure(image="", text="无法预览")
+
+    def view_attachment(self):
+        """使用系统默认程序查看选中的附件"""
+        attachment = self.get_selected_attachment()
+        if not attachment:
+            messagebox.showinfo("信息", "请先选择一个附件", parent=self.dialog)
+            return
+
+        full_path = os.path.join(DATA_DIR, attachment["path"])
+        if not os.path.exists(full_path):
+            messagebox.showerror("错误", "附件文件不存在", parent=self.dialog)
+            return
+
+        try:
+            webbrowser.open(os.path.abspath(full_path))
+        except Exception as e:
+            messagebox.showerror("错误", f"无法打开文件: {str(e)}", parent=self.dialog)
+
+    def remove_attachment(self):
+        """从Bug中移除选中的附件（保存时才删除文件）"""
+        attachment = self.get_selected_attachment()
+        if not attachment:
+            messagebox.showinfo("信息", "请先选择一个附件", parent=self.dialog)
+            return
+
+        self.attachments.remove(attachment)
+        self.removed_paths.append(attachment["path"])
+        self.refresh_listbox()
+
+    def commit(self):
+        """保存Bug时调用：删除被移除的附件文件，返回最终附件列表"""
+        self.closed = True
+        for rel_path in self.removed_paths:
+            remove_attachment_file(rel_path)
+        return self.attachments
+
+    def discard(self):
+        """放弃修改时调用：取消上传并清理本次新上传的附件"""
+        self.closed = True
+        for upload in self.uploads:
+            if not upload.cancel():
+                self.added_paths.append(upload.result["path"])
+        for rel_path in self.added_paths:
+            remove_attachment_file(rel_path)
+
 
 class BugListGUI:
     def __init__(self, root):
@@ -28,17 +963,23 @@ class BugListGUI:
         os.makedirs(ATTACHMENTS_DIR, exist_ok=True)
 
         # 加载主列表
-        self.master_list = self.load_master_list()
+        self.file_stamps = {}  # 最近一次读写时各数据文件的修改标记，用于检测其他用户的修改
+        with file_lock(MASTER_FILE):
+            self.master_list = self.load_master_list()
+            self.file_stamps[MASTER_FILE] = get_file_stamp(MASTER_FILE)
+        self.master_base = copy.deepcopy(self.master_list)
         self.current_list = self.master_list["current_list"] if self.master_list["lists"] else ""
         self.bugs = {}
         self.current_bug_id = 0  # 用于生成唯一ID
+        self.reset_project_state()
 
         # 创建界面
         self.create_widgets()
         self.load_current_list()
+        self.root.after(POLL_INTERVAL_MS, self.poll_changes)
 
     def load_master_list(self):
-        """加载主列表配置文件"""
+        """加载主列表配置文件（调用方需持有MASTER_FILE的锁）"""
         if os.path.exists(MASTER_FILE):
             try:
                 with open(MASTER_FILE, 'r') as f:
@@ -49,51 +990,158 @@ class BugListGUI:
         return {"lists": [], "current_list": "", "next_id": 1}
 
     def save_master_list(self):
-        """保存主列表配置"""
+        """保存主列表配置，与其他用户对项目列表的修改合并"""
+        with file_lock(MASTER_FILE):
+            self.merge_master_list()
+
+    def merge_master_list(self):
+        """将本地对主列表的修改合并到磁盘上的最新版本并写回（调用方需持有MASTER_FILE的锁）"""
         self.master_list["next_id"] = self.current_bug_id
-        with open(MASTER_FILE, 'w') as f:
-            json.dump(self.master_list, f, indent=2)
+        theirs = self.load_master_list()
+        items = {item["name"]: item for item in theirs["lists"]}
+        for item in self.master_list["lists"]:
+            items.setdefault(item["name"], item)
+
+        names = merge_list_names([item["name"] for item in self.master_base["lists"]],
+                                 [item["name"] for item in self.master_list["lists"]],
+                                 [item["name"] for item in theirs["lists"]])
+        current_list = self.master_list.get("current_list", "")
+        if current_list == self.master_base.get("current_list", ""):
+            current_list = theirs.get("current_list", "")
+        master = {
+            "lists": [items[name] for name in names],
+            "current_list": current_list,
+            "next_id": max(self.master_list["next_id"], theirs.get("next_id", 1))
+        }
+        if master != theirs:
+            write_json_atomic(MASTER_FILE, master)
+        self.file_stamps[MASTER_FILE] = get_file_stamp(MASTER_FILE)
+
+        self.master_list = master
+        self.master_base = copy.deepcopy(master)
 
     def get_list_filename(self, list_name):
         """获取列表文件名"""
         return os.path.join(DATA_DIR, f"{list_name}.json")
 
+    def get_project_data(self):
+        """获取当前项目的本地数据"""
+        return {
+            "bugs": self.bugs,
+            "next_id": self.current_bug_id,
+            "rev": self.project_rev,
+            "deleted": self.deleted_bugs,
+            "export_checkpoints": self.export_checkpoints
+        }
+
+    def set_project_data(self, data):
+        """设置当前项目数据，并记录为与磁盘同步的基准版本"""
+        self.bugs = data["bugs"]
+        self.current_bug_id = data["next_id"]
+        self.project_rev = data["rev"]
+        self.deleted_bugs = data["deleted"]
+        self.export_checkpoints = data["export_checkpoints"]
+        self.base_data = copy.deepcopy(data)
+
+    def reset_project_state(self):
+        """重置为空项目"""
+        self.set_project_data(new_project_data())
+
     def load_current_list(self):
         """加载当前列表数据"""
+        self.reset_project_state()
         if not self.current_list:
-            self.bugs = {}
             self.update_list()
             return
 
         filename = self.get_list_filename(self.current_list)
-        if os.path.exists(filename):
-            try:
-                with open(filename, 'r') as f:
-                    data = json.load(f)
-                    self.bugs = data.get("bugs", {})
-                    self.current_bug_id = data.get("next_id", 1)
-            except:
-                self.bugs = {}
-                self.current_bug_id = self.master_list.get("next_id", 1)
-        else:
-            self.bugs = {}
-            self.current_bug_id = self.master_list.get("next_id", 1)
+        try:
+            data, self.file_stamps[filename] = read_project(filename)
+            self.set_project_data(data)
+        except:
+            self.reset_project_state()
 
         self.update_list()
         self.status_var.set(f"已加载列表: {self.current_list}")
 
     def save_current_list(self):
-        """保存当前列表数据"""
+        """保存当前列表数据：加锁后与其他用户的修改合并再写回"""
         if not self.current_list:
             return
 
         filename = self.get_list_filename(self.current_list)
-        data = {
-            "bugs": self.bugs,
-            "next_id": self.current_bug_id
-        }
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+        old_bugs = self.bugs
+        try:
+            merged, conflicts, self.file_stamps[filename] = commit_project(
+                filename, self.base_data, self.get_project_data(), self.project_file_known(filename))
+        except FileNotFoundError:
+            self.on_project_removed()
+            return
+        self.set_project_data(merged)
+        self.refresh_rows(old_bugs)
+
+        if conflicts:
+            lines = [f"Bug {bug_id}: 字段 {field} 已被其他用户修改，保留了您的修改" if field
+                     else f"Bug {bug_id}: 已被其他用户修改或删除，保留了修改后的内容"
+                     for bug_id, field in conflicts]
+            messagebox.showwarning("保存冲突", "\n".join(lines[:20]))
+
+    def poll_changes(self):
+        """定时检测其他用户对主列表和当前项目的修改"""
+        try:
+            if get_file_stamp(MASTER_FILE) != self.file_stamps.get(MASTER_FILE):
+                self.refresh_master_list()
+            if self.current_list:
+                filename = self.get_list_filename(self.current_list)
+                stamp = get_file_stamp(filename)
+                if stamp is None and self.project_file_known(filename):
+                    self.on_project_removed()
+                elif stamp != self.file_stamps.get(filename):
+                    self.save_current_list()
+        except Exception as e:
+            self.set_status(f"同步其他用户的修改失败: {str(e)}", is_error=True)
+        self.root.after(POLL_INTERVAL_MS, self.poll_changes)
+
+    def project_file_known(self, filename):
+        """项目文件是否曾经从磁盘读取或写入过（之后消失说明已被其他用户重命名或删除）"""
+        return self.file_stamps.get(filename) is not None
+
+    def on_project_removed(self):
+        """当前项目文件已被其他用户重命名或删除：重新加载主列表，不写入空项目"""
+        removed = self.current_list
+        filename = self.get_list_filename(removed)
+        self.file_stamps.pop(filename, None)
+        remove_lock_file(filename)  # 检测时重新创建的.lock文件
+        self.refresh_master_list()
+        if self.current_list == removed:
+            # 主列表中仍有该项目（例如文件被手动删除），按空项目重新加载
+            self.load_current_list()
+        self.set_status(f"项目 '{removed}' 已被其他用户重命名或删除", is_error=True)
+
+    def refresh_master_list(self):
+        """同步其他用户对项目列表的修改"""
+        self.save_master_list()
+        list_names = [item["name"] for item in self.master_list["lists"]]
+        if self.current_list and self.current_list not in list_names:
+            # 当前项目已被其他用户删除或重命名
+            self.current_list = list_names[0] if list_names else ""
+            self.load_current_list()
+        self.update_list_combo()
+
+    def mark_bug_changed(self, bug_id):
+        """记录Bug变更：分配新的版本号并更新修改时间"""
+        bug_id = str(bug_id)
+        self.project_rev += 1
+
+        if bug_id in self.bugs:
+            bug_data = self.bugs[bug_id]
+            self.deleted_bugs.pop(bug_id, None)
+        else:
+            # Bug已删除，更新其墓碑记录
+            bug_data = self.deleted_bugs[bug_id]
+
+        bug_data["rev"] = self.project_rev
+        bug_data["modified"] = self.get_current_time()
 
     def create_widgets(self):
         # 主框架
@@ -124,6 +1172,10 @@ class BugListGUI:
                    command=self.rename_current_list).pack(side=tk.LEFT, padx=2)
         ttk.Button(btn_frame, text="导出Bug列表", width=10,
                    command=self.export_bug_list).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="增量导出", width=10,
+                   command=self.export_bug_changes).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="附件维护", width=10,
+                   command=self.maintain_attachments).pack(side=tk.LEFT, padx=2)
 
         # Bug列表区域
         bug_frame = ttk.LabelFrame(mainframe, text="Bug列表")
@@ -238,6 +1290,7 @@ class BugListGUI:
             self.current_list = list_name
             self.bugs = {}
             self.current_bug_id = 1
+            self.reset_project_state()
             self.update_list_combo()
             self.update_list()
             self.status_var.set(f"已创建并切换到项目: {list_name}")
@@ -266,13 +1319,25 @@ class BugListGUI:
             self.master_list["lists"] = [item for item in self.master_list["lists"]
                                          if item["name"] != self.current_list]
 
+            # 同时持有项目文件和主列表的锁，其他用户不会在删除文件和更新主列表之间读写该项目
             filename = self.get_list_filename(self.current_list)
-            if os.path.exists(filename):
-                os.remove(filename)
-
-            self.current_list = self.master_list["lists"][0]["name"] if self.master_list["lists"] else ""
-            self.master_list["current_list"] = self.current_list
-            self.save_master_list()
+            with file_lock(filename):
+                with file_lock(MASTER_FILE):
+                    # 以磁盘上的最新版本为准（包括其他用户新增的Bug）
+                    bugs = load_project_data(filename)["bugs"]
+                    if os.path.exists(filename):
+                        os.remove(filename)
+
+                    self.current_list = self.master_list["lists"][0]["name"] if self.master_list["lists"] else ""
+                    self.master_list["current_list"] = self.current_list
+                    self.merge_master_list()
+                remove_lock_file(filename)
+            self.file_stamps.pop(filename, None)
+
+            # 项目文件删除后再删除附件
+            for bug_data in bugs.values():
+                for attachment in get_bug_attachments(bug_data):
+                    remove_attachment_file(attachment["path"])
 
             self.load_current_list()
             self.update_list_combo()
@@ -311,19 +1376,32 @@ class BugListGUI:
                 messagebox.showerror("错误", f"项目 '{new_name}' 已存在", parent=dialog)
                 return
 
-            for item in self.master_list["lists"]:
-                if item["name"] == self.current_list:
-                    item["name"] = new_name
-                    break
-
             old_file = self.get_list_filename(self.current_list)
             new_file = self.get_list_filename(new_name)
-            if os.path.exists(old_file):
-                os.rename(old_file, new_file)
 
-            self.current_list = new_name
-            self.master_list["current_list"] = new_name
-            self.save_master_list()
+            # 同时持有项目文件和主列表的锁，其他用户不会在重命名文件和更新主列表之间读写该项目
+            with file_lock(old_file):
+                with file_lock(MASTER_FILE):
+                    exists = os.path.exists(new_file)
+                    if not exists:
+                        if os.path.exists(old_file):
+                            os.rename(old_file, new_file)
+
+                        for item in self.master_list["lists"]:
+                            if item["name"] == self.current_list:
+                                item["name"] = new_name
+                                break
+                        self.current_list = new_name
+                        self.master_list["current_list"] = new_name
+                        self.merge_master_list()
+                if not exists:
+                    remove_lock_file(old_file)
+
+            if exists:
+                messagebox.showerror("错误", f"项目 '{new_name}' 已存在", parent=dialog)
+                return
+
+            self.file_stamps[new_file] = self.file_stamps.pop(old_file, None)
             self.update_list_combo()
             self.status_var.set(f"已重命名为: {new_name}")
             dialog.destroy()
@@ -339,13 +1417,29 @@ class BugListGUI:
             self.tree.delete(item)
 
         for bug_id, bug_data in self.bugs.items():
-            self.tree.insert("", tk.END, values=(
-                bug_id,
-                bug_data["title"],
-                bug_data["responsible"],
-                bug_data["status"],
-                bug_data["modified"]
-            ))
+            self.tree.insert("", tk.END, iid=bug_id, values=self.get_row_values(bug_id, bug_data))
+
+    def get_row_values(self, bug_id, bug_data):
+        """获取Bug在列表中显示的各列数据"""
+        return (
+            bug_id,
+            bug_data["title"],
+            bug_data["responsible"],
+            bug_data["status"],
+            bug_data["modified"]
+        )
+
+    def refresh_rows(self, old_bugs):
+        """只刷新与old_bugs相比发生变化的Bug行，保留当前选择"""
+        for bug_id in old_bugs.keys() - self.bugs.keys():
+            if self.tree.exists(bug_id):
+                self.tree.delete(bug_id)
+
+        for bug_id, bug_data in self.bugs.items():
+            if not self.tree.exists(bug_id):
+                self.tree.insert("", tk.END, iid=bug_id, values=self.get_row_values(bug_id, bug_data))
+            elif old_bugs.get(bug_id) != bug_data:
+                self.tree.item(bug_id, values=self.get_row_values(bug_id, bug_data))
 
     def get_current_time(self):
         """获取当前时间（格式化）"""
@@ -378,9 +1472,12 @@ class BugListGUI:
             messagebox.showerror("错误", "请先选择或创建一个项目")
             return
 
+        # 记录打开对话框时的项目，对话框打开期间项目可能被其他用户重命名或删除而切换
+        project = self.current_list
+
         dialog = tk.Toplevel(self.root)
         dialog.title("新建Bug")
-        dialog.geometry("600x500")
+        dialog.geometry("700x600")
         dialog.attributes('-topmost', True)
         dialog.transient(self.root)
         dialog.grab_set()
@@ -388,9 +1485,8 @@ class BugListGUI:
         main_frame = ttk.Frame(dialog)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
-        # Bug ID
-        bug_id = self.current_bug_id
-        ttk.Label(main_frame, text=f"Bug ID: {bug_id}").grid(row=0, column=0, sticky=tk.W, pady=5)
+        # Bug ID（保存时加锁分配，避免多个用户同时新建时重复）
+        ttk.Label(main_frame, text="Bug ID: 保存时自动分配").grid(row=0, column=0, sticky=tk.W, pady=5)
 
         # 测试问题
         ttk.Label(main_frame, text="测试问题:").grid(row=1, column=0, sticky=tk.W, pady=5)
@@ -426,22 +1522,12 @@ class BugListGUI:
                      state="readonly", width=10).grid(row=4, column=3, sticky=tk.W, pady=5)
 
         # 附件区域
-        attachment_frame = ttk.LabelFrame(main_frame, text="附件")
-        attachment_frame.grid(row=5, column=0, columnspan=4, sticky=tk.W + tk.E, pady=10)
+        attachment_panel = AttachmentPanel(dialog, main_frame, [])
+        attachment_panel.frame.grid(row=5, column=0, columnspan=4, sticky=tk.W + tk.E, pady=10)
 
-        self.attachment_label = ttk.Label(attachment_frame, text="无附件")
-        self.attachment_label.pack(pady=5)
-
-        attachment_btn_frame = ttk.Frame(attachment_frame)
-        attachment_btn_frame.pack(pady=5)
-
-        self.attachment_path = None
-        ttk.Button(attachment_btn_frame, text="上传图片",
-                   command=lambda: self.upload_attachment(dialog)).pack(side=tk.LEFT, padx=5)
-        ttk.Button(attachment_btn_frame, text="查看图片",
-                   command=self.view_attachment).pack(side=tk.LEFT, padx=5)
-
-        self.image_label = None
+        def on_cancel():
+            attachment_panel.discard()
+            dialog.destroy()
 
         # 确认按钮
         def on_confirm():
@@ -449,7 +1535,24 @@ class BugListGUI:
                 messagebox.showerror("错误", "测试问题不能为空", parent=dialog)
                 return
 
+            if attachment_panel.is_busy():
+                messagebox.showerror("错误", "附件正在上传，请等待上传完成或取消上传", parent=dialog)
+                return
+
+            if self.current_list != project:
+                messagebox.showerror("错误", f"项目 '{project}' 已被其他用户重命名或删除，无法保存", parent=dialog)
+                on_cancel()
+                return
+
             # 保存Bug数据
+            filename = self.get_list_filename(project)
+            try:
+                bug_id = allocate_bug_id(filename, self.project_file_known(filename))
+            except FileNotFoundError:
+                messagebox.showerror("错误", f"项目 '{project}' 已被其他用户重命名或删除", parent=dialog)
+                on_cancel()
+                self.on_project_removed()
+                return
             self.bugs[str(bug_id)] = {
                 "title": title_entry.get().strip(),
                 "description": desc_entry.get("1.0", tk.END).strip(),
@@ -457,10 +1560,12 @@ class BugListGUI:
                 "responsible": resp_entry.get().strip(),
                 "status": status_var.get(),
                 "modified": self.get_current_time(),
-                "attachment": self.attachment_path
+                "attachments": attachment_panel.commit()
             }
+            self.mark_bug_changed(bug_id)
+            self.bugs[str(bug_id)]["created_rev"] = self.project_rev
 
-            self.current_bug_id += 1
+            self.current_bug_id = max(self.current_bug_id, bug_id + 1)
             self.save_current_list()
             self.update_list()
             self.set_status(f"已创建Bug: {title_entry.get().strip()}")
@@ -469,58 +1574,8 @@ class BugListGUI:
         btn_frame = ttk.Frame(dialog)
         btn_frame.pack(pady=10)
         ttk.Button(btn_frame, text="确定", command=on_confirm).pack(side=tk.LEFT, padx=10)
-        ttk.Button(btn_frame, text="取消", command=dialog.destroy).pack(side=tk.RIGHT, padx=10)
-
-    def upload_attachment(self, parent):
-        """上传图片附件"""
-        file_path = filedialog.askopenfilename(
-            parent=parent,
-            title="选择图片文件",
-            filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp *.gif"), ("All files", "*.*")]
-        )
-
-        if file_path:
-            # 创建按日期分类的附件目录
-            today = datetime.now().strftime("%Y%m%d")
-            daily_dir = os.path.join(ATTACHMENTS_DIR, today)
-            os.makedirs(daily_dir, exist_ok=True)
-
-            # 复制文件到附件目录
-            file_name = os.path.basename(file_path)
-            dest_path = os.path.join(daily_dir, file_name)
-            shutil.copy(file_path, dest_path)
-
-            self.attachment_path = os.path.join("attachments", today, file_name)
-            self.attachment_label.config(text=f"已上传: {file_name}")
-
-            # 在对话框中显示缩略图
-            if self.image_label:
-                self.image_label.destroy()
-
-            img = Image.open(file_path)
-            img.thumbnail((100, 100))
-            photo = ImageTk.PhotoImage(img)
-
-            self.image_label = ttk.Label(parent, image=photo)
-            self.image_label.image = photo
-            self.image_label.place(x=450, y=350)
-
-    def view_attachment(self):
-        """查看附件图片"""
-        if not self.attachment_path:
-            messagebox.showinfo("信息", "没有附件可查看")
-            return
-
-        full_path = os.path.join(DATA_DIR, self.attachment_path)
-        if not os.path.exists(full_path):
-            messagebox.showerror("错误", "附件文件不存在")
-            return
-
-        # 使用系统默认程序打开图片
-        try:
-            webbrowser.open(full_path)
-        except Exception as e:
-            messagebox.showerror("错误", f"无法打开文件: {str(e)}")
+        ttk.Button(btn_frame, text="取消", command=on_cancel).pack(side=tk.RIGHT, padx=10)
+        dialog.protocol("WM_DELETE_WINDOW", on_cancel)
 
     def view_bug_details(self, event=None):
         """查看/编辑Bug详情"""
@@ -533,6 +1588,10 @@ class BugListGUI:
             self.set_status(f"错误：Bug ID {bug_id} 不存在", is_error=True)
             return
 
+        # 记录打开时的项目和内容，保存时只写回用户修改过的字段，不覆盖其他用户同时做的修改
+        project = self.current_list
+        original = copy.deepcopy(bug_data)
+
         dialog = tk.Toplevel(self.root)
         dialog.title(f"Bug详情 - ID: {bug_id}")
         dialog.geometry("700x600")
@@ -584,37 +1643,45 @@ class BugListGUI:
                      state="readonly", width=10).grid(row=4, column=3, sticky=tk.W, pady=5)
 
         # 附件区域
-        attachment_frame = ttk.LabelFrame(main_frame, text="附件")
-        attachment_frame.grid(row=5, column=0, columnspan=4, sticky=tk.W + tk.E, pady=10)
+        attachment_panel = AttachmentPanel(dialog, main_frame, get_bug_attachments(bug_data))
+        attachment_panel.frame.grid(row=5, column=0, columnspan=4, sticky=tk.W + tk.E, pady=10)
 
-        self.attachment_path = bug_data.get("attachment")
-        if self.attachment_path:
-            file_name = os.path.basename(self.attachment_path)
-            self.attachment_label = ttk.Label(attachment_frame, text=f"附件: {file_name}")
-        else:
-            self.attachment_label = ttk.Label(attachment_frame, text="无附件")
-        self.attachment_label.pack(pady=5)
+        def on_cancel():
+            attachment_panel.discard()
+            dialog.destroy()
 
-        attachment_btn_frame = ttk.Frame(attachment_frame)
-        attachment_btn_frame.pack(pady=5)
+        # 确认按钮
+        def on_confirm():
+            if attachment_panel.is_busy():
+                messagebox.showerror("错误", "附件正在上传，请等待上传完成或取消上传", parent=dialog)
+                return
 
-        ttk.Button(attachment_btn_frame, text="上传图片",
-                   command=lambda: self.upload_attachment(dialog)).pack(side=tk.LEFT, padx=5)
-        ttk.Button(attachment_btn_frame, text="查看图片",
-                   command=self.view_attachment).pack(side=tk.LEFT, padx=5)
+            if self.current_list != project:
+                messagebox.showerror("错误", f"项目 '{project}' 已被其他用户重命名或删除，无法保存", parent=dialog)
+                on_cancel()
+                return
 
-        self.image_label = None
+            current = self.bugs.get(str(bug_id))
+            if current is None:
+                messagebox.showerror("错误", f"Bug {bug_id} 已被其他用户删除", parent=dialog)
+                on_cancel()
+                return
 
-        # 确认按钮
-        def on_confirm():
             # 更新Bug数据
-            bug_data["title"] = title_entry.get().strip()
-            bug_data["description"] = desc_entry.get("1.0", tk.END).strip()
-            bug_data["steps"] = steps_entry.get("1.0", tk.END).strip()
-            bug_data["responsible"] = resp_entry.get().strip()
-            bug_data["status"] = status_var.get()
-            bug_data["modified"] = self.get_current_time()
-            bug_data["attachment"] = self.attachment_path
+            values = {
+                "title": title_entry.get().strip(),
+                "description": desc_entry.get("1.0", tk.END).strip(),
+                "steps": steps_entry.get("1.0", tk.END).strip(),
+                "responsible": resp_entry.get().strip(),
+                "status": status_var.get()
+            }
+            for key, value in values.items():
+                if value != original.get(key):
+                    current[key] = value
+            current["attachments"] = merge_attachments(get_bug_attachments(original),
+                                                       attachment_panel.commit(),
+                                                       get_bug_attachments(current))
+            self.mark_bug_changed(bug_id)
 
             self.save_current_list()
             self.update_list()
@@ -624,7 +1691,8 @@ class BugListGUI:
         btn_frame = ttk.Frame(dialog)
         btn_frame.pack(pady=10)
         ttk.Button(btn_frame, text="保存修改", command=on_confirm).pack(side=tk.LEFT, padx=10)
-        ttk.Button(btn_frame, text="关闭", command=dialog.destroy).pack(side=tk.RIGHT, padx=10)
+        ttk.Button(btn_frame, text="关闭", command=on_cancel).pack(side=tk.RIGHT, padx=10)
+        dialog.protocol("WM_DELETE_WINDOW", on_cancel)
 
     def update_bug_status(self):
         """更新Bug状态"""
@@ -642,7 +1710,7 @@ class BugListGUI:
             return
 
         bug_data["status"] = new_status
-        bug_data["modified"] = self.get_current_time()
+        self.mark_bug_changed(bug_id)
 
         self.save_current_list()
         self.update_list()
@@ -669,17 +1737,19 @@ class BugListGUI:
 
         def on_confirm():
             if str(bug_id) in self.bugs:
-                # 删除附件
-                bug_data = self.bugs[str(bug_id)]
-                if bug_data.get("attachment"):
-                    full_path = os.path.join(DATA_DIR, bug_data["attachment"])
-                    if os.path.exists(full_path):
-                        os.remove(full_path)
-
-                del self.bugs[str(bug_id)]
+                bug_data = self.bugs.pop(str(bug_id))
+                self.deleted_bugs[str(bug_id)] = {"rev": bug_data["rev"]}
+                self.mark_bug_changed(bug_id)
                 self.save_current_list()
                 self.update_list()
-                self.set_status(f"已删除Bug: {bug_id}")
+
+                # 合并后Bug仍存在说明其他用户同时修改了它，此时保留附件
+                if str(bug_id) in self.bugs:
+                    self.set_status(f"Bug {bug_id} 已被其他用户修改，未删除", is_error=True)
+                else:
+                    for attachment in get_bug_attachments(bug_data):
+                        remove_attachment_file(attachment["path"])
+                    self.set_status(f"已删除Bug: {bug_id}")
             dialog.destroy()
 
         btn_frame = ttk.Frame(dialog)
@@ -704,28 +1774,103 @@ class BugListGUI:
 
         try:
             with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['ID', '测试问题', '问题详细', '复现步骤', '解决负责人', '状态', '最后修改时间',
-                              '附件路径']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                writer = csv.DictWriter(csvfile, fieldnames=EXPORT_FIELDNAMES)
                 writer.writeheader()
 
                 for bug_id, bug_data in self.bugs.items():
-                    writer.writerow({
-                        'ID': bug_id,
-                        '测试问题': bug_data['title'],
-                        '问题详细': bug_data['description'],
-                        '复现步骤': bug_data['steps'],
-                        '解决负责人': bug_data['responsible'],
-                        '状态': bug_data['status'],
-                        '最后修改时间': bug_data['modified'],
-                        '附件路径': bug_data.get('attachment', '')
-                    })
+                    writer.writerow(bug_to_row(bug_id, bug_data))
 
             self.set_status(f"Bug列表已导出到: {file_path}")
             messagebox.showinfo("成功", "Bug列表导出完成")
         except Exception as e:
             messagebox.showerror("错误", f"导出失败: {str(e)}")
 
+    def export_bug_changes(self):
+        """增量导出：只导出自该目标上次导出以来新增、修改和删除的Bug"""
+        if not self.current_list:
+            messagebox.showinfo("信息", "没有可导出的Bug数据")
+            return
+
+        # 检查点按导出目标名称记录，与输出文件名无关（每天导出到不同文件名也能只导出增量）
+        target = simpledialog.askstring("增量导出", "导出目标名称（例如报表系统名称）:",
+                                        initialvalue=DEFAULT_EXPORT_TARGET, parent=self.root)
+        if not target or not target.strip():
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV文件", "*.csv"), ("所有文件", "*.*")],
+            title="增量导出Bug变更"
+        )
+
+        if not file_path:
+            return
+
+        try:
+            # 先同步其他用户的修改，再导出
+            self.save_current_list()
+            count = export_incremental(self.get_project_data(), target.strip(), file_path)
+            self.save_current_list()
+            self.set_status(f"已增量导出 {count} 条变更（目标: {target.strip()}）到: {file_path}")
+            messagebox.showinfo("成功", f"增量导出完成，共 {count} 条变更")
+        except Exception as e:
+            messagebox.showerror("错误", f"导出失败: {str(e)}")
+
+    def maintain_attachments(self):
+        """检查附件完整性并清理孤立附件（后台执行）"""
+        self.save_current_list()
+        self.set_status("正在检查附件...")
+        self.run_in_background(lambda: scan_attachments(dry_run=True), self.on_attachments_scanned)
+
+    def on_attachments_scanned(self, report, error):
+        """附件检查完成后显示结果，并询问是否清理孤立附件"""
+        if error:
+            self.set_status(f"附件检查失败: {error}", is_error=True)
+            return
+
+        summary = format_scan_report(report, dry_run=True)
+        details = [f"缺失: [{project}] Bug {bug_id} - {rel_path}"
+                   for project, bug_id, rel_path in report["missing"][:10]]
+        details += [f"损坏: {rel_path} ({reason})" for rel_path, reason in report["corrupt"][:10]]
+        if details:
+            summary += "\n\n" + "\n".join(details)
+        self.set_status("附件检查完成")
+
+        if not report["orphaned"]:
+            messagebox.showinfo("附件检查结果", summary)
+            return
+
+        if messagebox.askyesno("附件检查结果", summary + "\n\n是否删除孤立附件?"):
+            self.set_status("正在清理孤立附件...")
+            self.run_in_background(lambda: remove_orphans(report["orphaned"]), self.on_attachments_cleaned)
+
+    def on_attachments_cleaned(self, reclaimed, error):
+        """孤立附件清理完成"""
+        if error:
+            self.set_status(f"清理失败: {error}", is_error=True)
+            return
+        self.set_status(f"已清理孤立附件，释放 {reclaimed / 1024 / 1024:.1f} MB")
+
+    def run_in_background(self, task, callback):
+        """在后台线程执行任务，完成后在主线程调用 callback(result, error)"""
+        state = {}
+
+        def worker():
+            try:
+                state["result"] = task()
+            except Exception as e:
+                state["error"] = str(e)
+            state["done"] = True
+
+        def poll():
+            if state.get("done"):
+                callback(state.get("result"), state.get("error"))
+            else:
+                self.root.after(200, poll)
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(200, poll)
+
     def on_close(self):
         """关闭窗口时保存数据"""
         self.save_current_list()
@@ -733,8 +1878,69 @@ class BugListGUI:
         self.root.destroy()
 
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Bug列表管理工具")
+    parser.add_argument("--gc-attachments", action="store_true",
+                        help="检查附件完整性并删除孤立附件")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="只报告检查结果，不删除任何文件")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="并行工作线程/进程数")
+    parser.add_argument("--export-changes", nargs=2, metavar=("PROJECT", "FILE"),
+                        help="增量导出项目自该导出目标上次导出以来的变更到FILE")
+    parser.add_argument("--target", default=DEFAULT_EXPORT_TARGET,
+                        help="增量导出的目标名称，每个目标分别记录检查点（与输出文件名无关）")
+    parser.add_argument("--stress-test", action="store_true",
+                        help="多进程并发写入压力测试，检查多人同时使用时是否丢失修改")
+    parser.add_argument("--stress-ops", type=int, default=50,
+                        help="压力测试中每个进程的操作次数")
+    parser.add_argument("--stress-dir", default=None,
+                        help="压力测试使用的目录（例如共享盘上的目录），默认使用系统临时目录")
+    args = parser.parse_args()
+
+    if args.stress_test:
+        processes = args.workers or 8
+        start = time.time()
+        errors = run_stress_test(processes, args.stress_ops, args.stress_dir)
+        for error in errors:
+            print(error)
+        print(f"{processes} 个进程 x {args.stress_ops} 次操作，耗时 {time.time() - start:.1f} 秒: "
+              + ("失败" if errors else "通过"))
+        return 1 if errors else 0
+
+    if args.export_changes:
+        list_name, file_path = args.export_changes
+        filename = os.path.join(DATA_DIR, f"{list_name}.json")
+        if not os.path.exists(filename):
+            print(f"项目不存在: {list_name}")
+            return 1
+        with file_lock(filename):
+            data = load_project_data(filename)
+            count = export_incremental(data, args.target, file_path)
+            write_json_atomic(filename, data)
+        print(f"已增量导出 {count} 条变更（目标: {args.target}）到: {file_path}")
+        return 0
+
+    if args.gc_attachments:
+        if not os.path.isdir(ATTACHMENTS_DIR):
+            print(f"附件目录不存在: {ATTACHMENTS_DIR}")
+            return 1
+        report = scan_attachments(dry_run=args.dry_run, workers=args.workers)
+        for project, bug_id, rel_path in report["missing"]:
+            print(f"缺失: [{project}] Bug {bug_id} - {rel_path}")
+        for rel_path, reason in report["corrupt"]:
+            print(f"损坏: {rel_path} ({reason})")
+        for rel_path, size in report["orphaned"]:
+            print(f"孤立: {rel_path} ({size} 字节)")
+        print(format_scan_report(report, args.dry_run))
+        return 0
+
     root = tk.Tk()
     app = BugListGUI(root)
     root.protocol("WM_DELETE_WINDOW", app.on_close)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file